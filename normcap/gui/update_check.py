@@ -1,8 +1,9 @@
 """Find new version on github or pypi."""
 
+import functools
 import logging
 import re
-from typing import Optional
+from typing import Optional, Union
 
 from PySide6 import QtCore, QtGui, QtWidgets
 
@@ -13,6 +14,24 @@ from normcap.gui.localization import _
 
 logger = logging.getLogger(__name__)
 
+_RE_ATOM = re.compile(rb'/releases/tag/v(\d+\.\d+\.\d+)"')
+_RE_JSON = re.compile(rb'"version":\s*"(\d+\.\d+\.\d+)"')
+
+# Upper bound for responses to be parsed. The atom feed and the json from pypi are
+# significantly smaller; anything larger is not expected and therefore not searched.
+MAX_RESPONSE_BYTES = 2_000_000
+
+
+def _version_trio(version: str) -> tuple[int, ...]:
+    """Get major, minor & patch as integers, ignoring any pre-release suffix."""
+    base = version.split("-", 1)[0]
+    return tuple(int(c) for c in base.split(".")[:3])
+
+
+@functools.cache
+def _get_icon_pixmap() -> QtGui.QPixmap:
+    return QtGui.QIcon(":normcap").pixmap(48, 48)
+
 
 class Communicate(QtCore.QObject):
     """TrayMenus' communication bus."""
@@ -40,12 +59,12 @@ class UpdateChecker(QtWidgets.QWidget):
         self.downloader.com.on_download_finished.connect(self._on_download_finished)
 
         self.url = URLS.releases_atom if self.packaged else f"{URLS.pypi_json}"
-        self.version_regex = (
-            r"/releases/tag/v(\d+\.\d+\.\d+)\""  # atom
-            if self.packaged
-            else r"\"version\":\s*\"(\d+\.\d+\.\d+)\""  # json
-        )
-        self.message_box = self._create_message_box()
+        self._version_re = _RE_ATOM if self.packaged else _RE_JSON
+
+    @functools.cached_property
+    def message_box(self) -> QtWidgets.QMessageBox:
+        """Create message box on first use, as most update checks won't need it."""
+        return self._create_message_box()
 
     @QtCore.Slot()
     def _check(self) -> None:
@@ -54,14 +73,19 @@ class UpdateChecker(QtWidgets.QWidget):
         self.downloader.get(self.url, timeout=10)
 
     @QtCore.Slot(bytes, str)
-    def _on_download_finished(self, data: bytes, url: str) -> None:
+    def _on_download_finished(
+        self, data: Union[bytes, bytearray, memoryview], url: str
+    ) -> None:
         """Parse the tag version from the response and emit version retrieved signal."""
+        if len(data) > MAX_RESPONSE_BYTES:
+            logger.error("Response of update check is too large (%s bytes)!", len(data))
+            return
+
         fetched_version = None
         try:
-            text = data.decode("utf-8", errors="ignore")
-            match = re.search(self.version_regex, text)
+            match = self._version_re.search(memoryview(data))
             if match and match[1]:
-                fetched_version = match[1]
+                fetched_version = match[1].decode("ascii")
         except Exception:
             logger.exception("Parsing response of update check failed.")
 
@@ -118,7 +142,7 @@ class UpdateChecker(QtWidgets.QWidget):
         # - Avoids the state where the message box has focus but is behind the window
         message_box.setWindowFlags(QtCore.Qt.WindowType.Popup)
 
-        message_box.setIconPixmap(QtGui.QIcon(":normcap").pixmap(48, 48))
+        message_box.setIconPixmap(_get_icon_pixmap())
         message_box.setStandardButtons(
             QtWidgets.QMessageBox.StandardButton.Ok
             | QtWidgets.QMessageBox.StandardButton.Cancel
@@ -142,7 +166,4 @@ class UpdateChecker(QtWidgets.QWidget):
             logging.debug("Discarding pre-release version %s", other)
             return False
 
-        current = current.split("-")[0]
-        current_version = [int(c) for c in current.split(".")]
-        other_version = [int(c) for c in other.split(".")]
-        return other_version > current_version
+        return _version_trio(other) > _version_trio(current)
@@ -1,18 +1,23 @@
 """Capture screenshots for all screens using org.freedesktop.portal.Desktop."""
 
+import functools
+import json
 import logging
-import random
+import os
 import re
 import sys
 from pathlib import Path
-from typing import Optional
-from urllib.parse import urlparse
+from typing import TYPE_CHECKING, Optional, Union
 
-from PySide6 import QtCore, QtDBus, QtGui
+from PySide6 import QtCore, QtGui
 
 from normcap.screengrab import system_info
 from normcap.screengrab.post_processing import split_full_desktop_to_screens
 
+if TYPE_CHECKING:
+    # QtDBus is imported on demand, as it isn't needed unless this handler is used.
+    from PySide6 import QtDBus
+
 logger = logging.getLogger(__name__)
 
 install_instructions = ""
@@ -34,24 +39,29 @@ install_instructions = ""
 # ONHOLD: Check in 2024 if the portal was updated to always return a response message.
 TIMEOUT_SECONDS = 10
 
+# The Screenshot method call itself only returns the handle of the request, while
+# the screenshot is delivered later via the Response signal (which is guarded by the
+# timeout above). The call should therefore time out clearly earlier, so that a
+# missing reply is reported as such and not masked by the response timeout.
+CALL_TIMEOUT_SECONDS = 3
 
-class OrgFreedesktopPortalRequestInterface(QtDBus.QDBusAbstractInterface):
-    Response = QtCore.Signal(QtDBus.QDBusMessage)
+PORTAL_SERVICE = "org.freedesktop.portal.Desktop"
 
-    def __init__(
-        self, path: str, connection: QtDBus.QDBusConnection, parent: QtCore.QObject
-    ) -> None:
-        super().__init__(
-            "org.freedesktop.portal.Desktop",
-            path,
-            "org.freedesktop.portal.Request",  # type: ignore
-            connection,
-            parent,
-        )
+# Note on Portal Mode Cache:
+#
+# A screenshot in none-interactive mode only succeeds after the permission was
+# granted once. Until then, each attempt costs a full TIMEOUT_SECONDS. Therefore, the
+# outcome is persisted per desktop environment, so that subsequent runs can directly
+# report the permission as missing, if the none-interactive mode is known to fail.
+PORTAL_MODE_CACHE_FILE = "portal_mode.json"
+
+# Extracts the URI from the string representation of a portal response, e.g.:
+# [Argument: a{sv} {"uri" = [Variant(QString): "file:///path/to/screenshot.png"]}]
+_URI_RE = re.compile(r'"uri"\s*=\s*\[Variant\(QString\):\s*"([^"]+)"\]')
 
 
 class OrgFreedesktopPortalScreenshot(QtCore.QObject):
-    on_response = QtCore.Signal(QtDBus.QDBusMessage)
+    on_response = QtCore.Signal(object)  # QtDBus.QDBusMessage
     on_result = QtCore.Signal(str)
     on_exception = QtCore.Signal(Exception)
 
@@ -61,38 +71,87 @@ class OrgFreedesktopPortalScreenshot(QtCore.QObject):
         interactive: bool = False,
         timeout_sec: int = 15,
     ) -> None:
+        from PySide6 import QtDBus
+
         super().__init__(parent)
         self.interactive = interactive
         self.timeout_timer = self._get_timeout_timer(timeout_sec)
         self.on_response.connect(self.got_signal)
+        self.request_path: Optional[str] = None
+        self.interface = QtDBus.QDBusInterface(
+            PORTAL_SERVICE,
+            "/org/freedesktop/portal/desktop",
+            "org.freedesktop.portal.Screenshot",
+            QtDBus.QDBusConnection.sessionBus(),
+            self,
+        )
+        self.interface.setTimeout(
+            int(min(CALL_TIMEOUT_SECONDS, timeout_sec / 2) * 1000)
+        )
 
     def grab_full_desktop(self) -> None:
-        bus = QtDBus.QDBusConnection.sessionBus()
+        from PySide6 import QtDBus
+
+        bus = self.interface.connection()
 
         base = bus.baseService()[1:].replace(".", "_")
 
-        random_str = "".join(random.choice("abcdefghi") for _ in range(8))  # noqa: S311
-        token = f"normcap_{random_str}"
+        token = f"normcap_{os.urandom(4).hex()}"
         object_path = f"/org/freedesktop/portal/desktop/request/{base}/{token}"
 
-        request = OrgFreedesktopPortalRequestInterface(object_path, bus, self)
-        request.Response.connect(self.on_response)
+        # Drop the request of a previous call, so that a late response to it can't
+        # be mistaken as response to the current one.
+        self._drop_request()
 
-        interface = QtDBus.QDBusInterface(
-            "org.freedesktop.portal.Desktop",
-            "/org/freedesktop/portal/desktop",
-            "org.freedesktop.portal.Screenshot",
-            bus,
-            self,
-        )
+        self._connect_request(object_path)
 
-        message = interface.call(
-            "Screenshot", "", {"interactive": False, "handle_token": token}
+        # Call asynchronously to keep the event loop responsive during the request
+        pending_call = self.interface.asyncCallWithArgumentList(
+            "Screenshot", ["", self._get_options(handle_token=token)]
         )
-        logger.debug("DBus request message: %s", str(message))
+        watcher = QtDBus.QDBusPendingCallWatcher(pending_call, self)
+        on_finished = functools.partial(self._on_request_finished, watcher, object_path)
+        if watcher.isFinished():
+            # E.g. if not connected to the bus, the call fails right away, and in that
+            # case the watcher doesn't emit its finished signal.
+            on_finished()
+        else:
+            watcher.finished.connect(on_finished)
+
+    def _get_options(self, handle_token: str) -> dict[str, Union[bool, str]]:
+        """Build the options of the screenshot request.
+
+        The values have to be plain python types, which are marshalled as variants
+        into the a{sv} argument. (Wrapping them in QDBusVariant results in nested
+        variants, which the portal doesn't accept.)
+        """
+        return {"interactive": self.interactive, "handle_token": handle_token}
+
+    def _on_request_finished(
+        self, watcher: "QtDBus.QDBusPendingCallWatcher", request_path: str
+    ) -> None:
+        from PySide6 import QtDBus
+
+        message = watcher.reply()
+        watcher.deleteLater()
+        logger.debug("DBus request message: %s", message)
+
+        if request_path != self.request_path:
+            # The portal object is reused, so a late reply might belong to a
+            # previous request, which already timed out or got a response.
+            logger.debug("Ignore reply to outdated request %s", request_path)
+            return
+
+        if watcher.isError() and (
+            watcher.error().type() == QtDBus.QDBusError.ErrorType.NoReply
+        ):
+            msg = "No reply to screenshot request from xdg-portal!"
+            logger.error(msg)
+            self.on_exception.emit(TimeoutError(msg))
+            return
 
         if (
-            isinstance(message, QtDBus.QDBusMessage)
+            not watcher.isError()
             and message.arguments()
             and isinstance(message.arguments()[0], QtDBus.QDBusObjectPath)
         ):
@@ -102,6 +161,36 @@ class OrgFreedesktopPortalScreenshot(QtCore.QObject):
             logger.error(msg)
             self.on_exception.emit(RuntimeError(msg))
 
+    def _connect_request(self, path: str) -> None:
+        """Listen to the response signal of the request object on the given path."""
+        self.request_path = path
+        self.interface.connection().connect(
+            PORTAL_SERVICE,
+            path,
+            "org.freedesktop.portal.Request",
+            "Response",
+            self,
+            QtCore.SLOT("_on_response_received(QDBusMessage)"),
+        )
+
+    def _drop_request(self) -> None:
+        """Stop listening to the current request's response signal."""
+        if not self.request_path:
+            return
+        self.interface.connection().disconnect(
+            PORTAL_SERVICE,
+            self.request_path,
+            "org.freedesktop.portal.Request",
+            "Response",
+            self,
+            QtCore.SLOT("_on_response_received(QDBusMessage)"),
+        )
+        self.request_path = None
+
+    @QtCore.Slot("QDBusMessage")
+    def _on_response_received(self, message: "QtDBus.QDBusMessage") -> None:
+        self.on_response.emit(message)
+
     def _get_timeout_timer(self, timeout_sec: int) -> QtCore.QTimer:
         def _timeout_triggered() -> None:
             msg = f"No response from xdg-portal within {timeout_sec}s!"
@@ -114,9 +203,12 @@ class OrgFreedesktopPortalScreenshot(QtCore.QObject):
         timeout_timer.timeout.connect(_timeout_triggered)
         return timeout_timer
 
-    def got_signal(self, message: QtDBus.QDBusMessage) -> None:
+    def got_signal(self, message: "QtDBus.QDBusMessage") -> None:
         self.timeout_timer.stop()
-        logger.debug("DBus signal message: %s", str(message))
+        # The portal sends exactly one response per request. Dropping the request
+        # right away also removes its match rule from the bus connection.
+        self._drop_request()
+        logger.debug("DBus signal message: %s", message)
 
         code, _ = message.arguments()
         all_okay_code = 0
@@ -135,39 +227,167 @@ class OrgFreedesktopPortalScreenshot(QtCore.QObject):
             return
 
         logger.debug("Parse response")
-        # ONHOLD: Extracting DBusArgument as below should work, but it doesn't.
-        #         As there doesn't seem to be another way to access the arguments,
-        #         we workaround by parsing the URI from string representation.
-        # _, arg = message.arguments()
-        # QtDBus.QDBusMessage()
-        # arg.beginArray()
-        # while not arg.atEnd():
-        #     arg.beginMap()
-        #     while not arg.atEnd():
-        #         arg.beginMapEntry()
-        #         key = arg.asVariant()
-        #         value = arg.asVariant()
-        #         arg.endMapEntry()
-        #     arg.endMap()
-        # arg.endArray()
-
-        reg_uri = r"""
-                  \[Variant\(QString\)\:\ \"  # start of URI object
-                  (.*)                       # URI itself
-                  \"\]\}                     # end of URI object
-                  """
-        result = re.search(reg_uri, str(message), re.VERBOSE)
-
-        if not result:
+        uri = _get_uri_from_response(message)
+        if not uri:
             msg = f"Couldn't parse URI from message: {message}"
             logger.error(msg)
             self.on_exception.emit(RuntimeError(message))
             return
 
-        uri = result.group(1)
         self.on_result.emit(uri)
 
 
+@functools.lru_cache(maxsize=2)
+def _get_portal(interactive: bool, timeout_sec: int) -> OrgFreedesktopPortalScreenshot:
+    """Get portal instance, which is reused for subsequent captures in same mode."""
+    return OrgFreedesktopPortalScreenshot(
+        interactive=interactive, timeout_sec=timeout_sec
+    )
+
+
+def _get_uri_from_response(message: "QtDBus.QDBusMessage") -> Optional[str]:
+    """Extract the screenshot's URI from the results of a portal response.
+
+    Messages created by PySide6 itself carry the results as dict. But for messages
+    received via DBus, the results are a QDBusArgument, for which demarshalling
+    doesn't work in PySide6 (asVariant() returns None). As there doesn't seem to be
+    another way to access those arguments, we fall back to parse the URI from the
+    string representation of the message.
+    """
+    _, results = message.arguments()
+    if isinstance(results, dict):
+        uri = results.get("uri")
+        return uri if isinstance(uri, str) else None
+
+    result = _URI_RE.search(str(message))
+    return result.group(1) if result else None
+
+
+def _get_portal_mode_cache_path() -> Path:
+    cache_home = os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "normcap" / PORTAL_MODE_CACHE_FILE
+
+
+def _get_desktop_key() -> str:
+    return os.environ.get("XDG_CURRENT_DESKTOP", "").lower() or "unknown"
+
+
+@functools.cache
+def _read_portal_modes() -> dict[str, dict[str, bool]]:
+    """Read the portal mode cache file once, later updates happen in place."""
+    cache_path = _get_portal_mode_cache_path()
+    if not cache_path.exists():
+        return {}
+    try:
+        portal_modes = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        logger.warning("Could not read portal mode cache '%s'!", cache_path)
+        return {}
+    return portal_modes if isinstance(portal_modes, dict) else {}
+
+
+def _load_portal_mode() -> dict[str, bool]:
+    portal_mode = _read_portal_modes().get(_get_desktop_key(), {})
+    return portal_mode if isinstance(portal_mode, dict) else {}
+
+
+def _load_interactive_required() -> bool:
+    """Check if the none-interactive mode was known to fail on the current desktop."""
+    return bool(_load_portal_mode().get("interactive_required", False))
+
+
+def _has_captured_before() -> bool:
+    """Check if a screenshot was successfully taken on the current desktop before."""
+    return bool(_load_portal_mode().get("has_captured", False))
+
+
+def _update_portal_mode(**values: bool) -> None:
+    """Persist the portal mode for the current desktop (if changed)."""
+    portal_modes = _read_portal_modes()
+    desktop_key = _get_desktop_key()
+    portal_mode = {**_load_portal_mode(), **values}
+    if portal_modes.get(desktop_key) == portal_mode:
+        return
+
+    portal_modes[desktop_key] = portal_mode
+    cache_path = _get_portal_mode_cache_path()
+    temp_path = cache_path.with_suffix(".tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path.write_text(json.dumps(portal_modes), encoding="utf-8")
+        temp_path.replace(cache_path)
+    except OSError:
+        logger.warning("Could not write portal mode cache '%s'!", cache_path)
+
+
+@functools.cache
+def get_portal_version() -> int:
+    """Query the version of the screenshot portal.
+
+    Returns:
+        Version of org.freedesktop.portal.Screenshot, or 0 if it can't be retrieved.
+    """
+    from PySide6 import QtDBus
+
+    interface = QtDBus.QDBusInterface(
+        PORTAL_SERVICE,
+        "/org/freedesktop/portal/desktop",
+        "org.freedesktop.DBus.Properties",
+        QtDBus.QDBusConnection.sessionBus(),
+    )
+    message = interface.call("Get", "org.freedesktop.portal.Screenshot", "version")
+    arguments = message.arguments()
+    version = arguments[0] if arguments else None
+    if isinstance(version, QtDBus.QDBusVariant):
+        version = version.variant()
+
+    if not isinstance(version, int):
+        logger.warning("Could not retrieve version of xdg-portal: %s", message)
+        return 0
+
+    logger.debug("Screenshot portal version: %s", version)
+    return version
+
+
+@functools.cache
+def is_portal_available() -> bool:
+    """Check if the xdg-portal is reachable via the session bus.
+
+    The portal service is usually started on demand, so besides the already
+    registered services also the activatable ones are considered.
+
+    Returns:
+        True if the portal service is running or can be activated.
+    """
+    from PySide6 import QtDBus
+
+    bus = QtDBus.QDBusConnection.sessionBus()
+    if not bus.isConnected():
+        logger.warning("Not connected to dbus session bus!")
+        return False
+
+    bus_interface = bus.interface()
+    if bus_interface.isServiceRegistered(PORTAL_SERVICE).value():
+        return True
+
+    activatable = bus_interface.activatableServiceNames()
+    if activatable.isValid() and PORTAL_SERVICE in activatable.value():
+        return True
+
+    logger.warning("Service %s is not available on dbus session bus!", PORTAL_SERVICE)
+    return False
+
+
+def can_request_permission_directly() -> bool:
+    """Check if the permission can be requested without explaining it beforehand.
+
+    Since version 2, the screenshot portal keeps track of the permission and asks
+    for it by itself. If a screenshot was already taken successfully on the current
+    desktop before, the user is familiar with the procedure.
+    """
+    return _has_captured_before() and get_portal_version() >= 2  # noqa: PLR2004
+
+
 def _synchronized_capture(interactive: bool) -> QtGui.QImage:
     loop = QtCore.QEventLoop()
     result = []
@@ -181,34 +401,51 @@ def _synchronized_capture(interactive: bool) -> QtGui.QImage:
         exceptions.append(uri)
         loop.exit()
 
-    portal = OrgFreedesktopPortalScreenshot(
-        interactive=interactive, timeout_sec=TIMEOUT_SECONDS
-    )
+    portal = _get_portal(interactive=interactive, timeout_sec=TIMEOUT_SECONDS)
     portal.on_result.connect(_signal_triggered)
     portal.on_exception.connect(_exception_triggered)
 
-    portal.timeout_timer.start()
-    QtCore.QTimer.singleShot(0, portal.grab_full_desktop)
-    loop.exec()
-
-    portal.on_result.disconnect(_signal_triggered)
-    portal.on_exception.disconnect(_exception_triggered)
+    try:
+        portal.timeout_timer.start()
+        QtCore.QTimer.singleShot(0, portal.grab_full_desktop)
+        loop.exec()
+    finally:
+        portal.timeout_timer.stop()
+        portal.on_result.disconnect(_signal_triggered)
+        portal.on_exception.disconnect(_exception_triggered)
 
     for error in exceptions:
+        if isinstance(error, TimeoutError) and not interactive:
+            _update_portal_mode(interactive_required=True)
         raise error
 
+    _update_portal_mode(interactive_required=False, has_captured=True)
+
     uri = result[0]
-    parsed_uri = urlparse(uri)
+    path = uri.removeprefix("file://")
+    if "%" in path:
+        from urllib.parse import unquote
+
+        path = unquote(path)
 
-    image_path = Path(parsed_uri.path)
-    image = QtGui.QImage(image_path)
+    image_path = Path(path)
+    try:
+        image_data = image_path.read_bytes()
+    except OSError as exc:
+        logger.warning("Could not read screenshot file '%s'!", image_path)
+        raise RuntimeError(f"Could not read screenshot file '{image_path}'!") from exc
+
+    image = QtGui.QImage()
+    image.loadFromData(image_data)
 
     # XDG Portal save the image file to the users xdg-pictures directory. To not let
-    # them pile up, we try to remove it:
+    # them pile up, we try to remove it right after it got read:
     try:
         image_path.unlink()
     except PermissionError:
         logger.warning("Missing permission to remove screenshot file '%s'!", image_path)
+    except OSError:
+        logger.warning("Could not remove screenshot file '%s'!", image_path)
 
     return image
 
@@ -231,10 +468,22 @@ def capture() -> list[QtGui.QImage]:
     "interactive" mode, before the application is allowed to query screenshots without
     the dialog window in between.
 
-    As there is no way to query for that permission, we try both:
-    1. Try none-interactive mode
-    2. If timeout triggers, retry in interactive mode with a helper window
+    As there is no way to query for that permission, the none-interactive mode is
+    tried, and a timeout is treated as missing permission. The interactive request is
+    then left to the permission dialog (see permissions.py).
+
+    If the none-interactive mode timed out on a previous run on the same desktop
+    environment (and no interactive request succeeded since), the permission is
+    reported as missing right away to avoid waiting for the timeout again.
     """
+    if not is_portal_available():
+        raise RuntimeError("xdg-portal is not available on dbus session bus!")
+
+    if _load_interactive_required():
+        raise PermissionError(
+            "Screenshot permission missing, none-interactive mode failed before!"
+        )
+
     try:
         image = _synchronized_capture(interactive=False)
     except TimeoutError as exc:
@@ -5,16 +5,10 @@ import logging
 import os
 import tempfile
 from pathlib import Path
-from typing import Any, Union, cast
+from typing import Union
 
 from PySide6 import QtGui
 
-try:
-    from PySide6 import QtDBus
-
-except ImportError:
-    QtDBus = cast(Any, None)
-
 from normcap.screengrab.post_processing import split_full_desktop_to_screens
 
 logger = logging.getLogger(__name__)
@@ -23,8 +17,10 @@ install_instructions = ""
 
 
 def _get_screenshot_interface():  # noqa: ANN202
-    if not QtDBus:
-        raise ModuleNotFoundError("QtDBUS not available.")
+    try:
+        from PySide6 import QtDBus
+    except ImportError as exc:
+        raise ModuleNotFoundError("QtDBUS not available.") from exc
 
     item = "org.gnome.Shell.Screenshot"
     interface = "org.gnome.Shell.Screenshot"
@@ -38,9 +34,6 @@ def _get_screenshot_interface():  # noqa: ANN202
 
 def _fullscreen_to_file(filename: Union[os.PathLike, str]) -> None:
     """Capture full screen and store it in file."""
-    if not QtDBus:
-        raise ModuleNotFoundError("QtDBUS not available.")
-
     screenshot_interface = _get_screenshot_interface()
     if screenshot_interface.isValid():
         result = screenshot_interface.call("Screenshot", True, False, filename)
@@ -1,5 +1,6 @@
 import ctypes
 import ctypes.util
+import functools
 import logging
 import subprocess
 import sys
@@ -179,17 +180,26 @@ class DbusPortalPermissionDialog(QtWidgets.QDialog):
         try:
             logger.debug("Request screenshot with interactive=True")
             self.capture = dbus_portal._synchronized_capture(interactive=True)
-        except TimeoutError:
-            logger.warning("Timeout when taking screenshot!")
-        self.setResult(0)
-        self.setEnabled(True)
-        self.hide()
+        except (PermissionError, TimeoutError, RuntimeError) as exc:
+            logger.warning("Requesting screenshot permission failed.", exc_info=exc)
+        finally:
+            self.setResult(0)
+            self.setEnabled(True)
+            self.hide()
 
     def reject_button_pressed(self) -> None:
         self.setResult(1)
         self.hide()
 
 
+@functools.lru_cache(maxsize=1)
+def _get_dbus_portal_permission_dialog(
+    title: str, text: str
+) -> DbusPortalPermissionDialog:
+    """Create the dialog once and reuse it, if permission is requested repeatedly."""
+    return DbusPortalPermissionDialog(title=title, text=text)
+
+
 def _dbus_portal_has_screenshot_permission() -> bool:
     if not dbus_portal:
         raise ModuleNotFoundError(
@@ -203,9 +213,27 @@ def _dbus_portal_has_screenshot_permission() -> bool:
     return len(result) > 0
 
 
+def _dbus_portal_request_permission_without_dialog() -> bool:
+    logger.debug("Request screenshot with interactive=True without dialog")
+    try:
+        image = dbus_portal._synchronized_capture(interactive=True)
+    except (PermissionError, TimeoutError, RuntimeError) as exc:
+        logger.warning("Requesting screenshot permission failed.", exc_info=exc)
+        return False
+    return not image.isNull()
+
+
 def dbus_portal_show_request_permission_dialog(title: str, text: str) -> bool:
-    window = DbusPortalPermissionDialog(title=title, text=text + "<br>")
-    choice = window.exec()
+    if dbus_portal and dbus_portal.can_request_permission_directly():
+        return _dbus_portal_request_permission_without_dialog()
+
+    window = _get_dbus_portal_permission_dialog(title=title, text=text + "<br>")
+    window.capture = []
+    window.setEnabled(True)
+    try:
+        choice = window.exec()
+    finally:
+        window.hide()
 
     if choice != 0:
         logger.warning("Screenshot permission dialog was canceled!")
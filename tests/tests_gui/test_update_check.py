@@ -88,6 +88,34 @@ def test_update_checker_cant_parse(qtbot, caplog, packaged, text):
     assert "ERROR" in caplog.text
 
 
+def test_message_box_is_created_lazily(qtbot):
+    # GIVEN a UpdateChecker
+    checker = update_check.UpdateChecker(None)
+
+    # THEN the message box should not be created before it is needed
+    #    and afterwards, the same instance should be reused
+    assert "message_box" not in checker.__dict__
+    assert checker.message_box is checker.message_box
+
+
+def test_message_box_icon_pixmap_is_cached(qtbot):
+    # GIVEN two UpdateCheckers
+    update_check._get_icon_pixmap.cache_clear()
+    checker_1 = update_check.UpdateChecker(None)
+    checker_2 = update_check.UpdateChecker(None)
+
+    # WHEN their message boxes are created
+    box_1 = checker_1.message_box
+    box_2 = checker_2.message_box
+
+    # THEN each checker has its own message box
+    #    but the icon pixmap is rendered only once
+    assert box_1 is not box_2
+    assert box_1.iconPixmap().size().toTuple() == (48, 48)
+    assert update_check._get_icon_pixmap.cache_info().misses == 1
+    assert update_check._get_icon_pixmap.cache_info().hits == 1
+
+
 def test_show_update_message(qtbot, monkeypatch):
     # GIVEN a UpdateChecker
     checker = update_check.UpdateChecker(None)
@@ -116,8 +144,16 @@ def test_show_update_message(qtbot, monkeypatch):
         (True, b'/releases/tag/v9.9.9"', ["9.9.9"], "Newest version: 9.9.9", True),
         (True, b'/releases/tag/v0.0.0"', [], "Newest version: 0.0.0", True),
         (False, b'"version": "9.9.9"', ["9.9.9"], "Newest version: 9.9.9", True),
+        (
+            False,
+            memoryview(b'"version": "9.9.9"'),
+            ["9.9.9"],
+            "Newest version: 9.9.9",
+            True,
+        ),
         (True, b"doesn't include version", [], "Could not detect remote", False),
         (True, "not-decodable", [], "Parsing response of update check failed", False),
+        (False, b" " * 2_000_001, [], "Response of update check is too large", False),
     ],
 )
 def test_on_download_finished(
@@ -7,6 +7,26 @@ import pytest
 from normcap.screengrab.permissions import has_screenshot_permission
 
 
+@pytest.fixture(autouse=True)
+def _temp_cache_home(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+
+@pytest.fixture(autouse=True)
+def _clear_portal_cache(dbus_portal):
+    cached_functions = (
+        dbus_portal._get_portal,
+        dbus_portal.get_portal_version,
+        dbus_portal.is_portal_available,
+        dbus_portal._read_portal_modes,
+    )
+    for func in cached_functions:
+        func.cache_clear()
+    yield
+    for func in cached_functions:
+        func.cache_clear()
+
+
 @pytest.mark.gui()
 @pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
 @pytest.mark.skipif("GITHUB_ACTIONS" in os.environ, reason="Skip on Action Runner")
@@ -22,16 +42,85 @@ def test_synchronized_capture(dbus_portal, qapp):
 @pytest.mark.gui()
 @pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
 def test_synchronized_capture_triggers_request_error(monkeypatch, dbus_portal):
+    from PySide6 import QtDBus
+
     def _mocked_interface_call(*args):
-        return dbus_portal.QtDBus.QDBusMessage()
+        error = QtDBus.QDBusMessage.createError(
+            "org.freedesktop.DBus.Error.Failed", "Mocked error"
+        )
+        return QtDBus.QDBusPendingCall.fromCompletedCall(error)
 
     monkeypatch.setattr(
-        dbus_portal.QtDBus.QDBusInterface, "call", _mocked_interface_call
+        QtDBus.QDBusInterface,
+        "asyncCallWithArgumentList",
+        _mocked_interface_call,
     )
     with pytest.raises(RuntimeError, match=r"[Nn]o object path"):
         _ = dbus_portal._synchronized_capture(interactive=False)
 
 
+@pytest.mark.gui()
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_synchronized_capture_triggers_timeout_on_no_reply(monkeypatch, dbus_portal):
+    from PySide6 import QtDBus
+
+    def _mocked_interface_call(*args):
+        error = QtDBus.QDBusMessage.createError(
+            "org.freedesktop.DBus.Error.NoReply", "Mocked timeout"
+        )
+        return QtDBus.QDBusPendingCall.fromCompletedCall(error)
+
+    monkeypatch.setattr(
+        QtDBus.QDBusInterface,
+        "asyncCallWithArgumentList",
+        _mocked_interface_call,
+    )
+    with pytest.raises(TimeoutError, match=r"[Nn]o reply"):
+        _ = dbus_portal._synchronized_capture(interactive=False)
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_portal_call_times_out_before_response(dbus_portal):
+    # GIVEN a portal with the default response timeout
+    portal = dbus_portal.OrgFreedesktopPortalScreenshot(
+        timeout_sec=dbus_portal.TIMEOUT_SECONDS
+    )
+
+    # WHEN the timeouts are compared
+    call_timeout = portal.interface.timeout()
+    response_timeout = portal.timeout_timer.interval()
+
+    # THEN a missing reply to the method call is detected clearly earlier
+    assert 0 < call_timeout <= response_timeout / 2
+
+
+@pytest.mark.gui()
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_portal_ignores_reply_to_outdated_request(dbus_portal):
+    from PySide6 import QtDBus
+
+    # GIVEN a portal waiting for a newer request
+    #    and a failed reply to a previous request
+    portal = dbus_portal.OrgFreedesktopPortalScreenshot()
+    portal.request_path = "/org/freedesktop/portal/desktop/request/1_0/new"
+    error = QtDBus.QDBusMessage.createError(
+        "org.freedesktop.DBus.Error.NoReply", "Mocked timeout"
+    )
+    watcher = QtDBus.QDBusPendingCallWatcher(
+        QtDBus.QDBusPendingCall.fromCompletedCall(error)
+    )
+    exceptions = []
+    portal.on_exception.connect(exceptions.append)
+
+    # WHEN the reply to the previous request is handled
+    portal._on_request_finished(
+        watcher, "/org/freedesktop/portal/desktop/request/1_0/old"
+    )
+
+    # THEN it doesn't affect the current request
+    assert exceptions == []
+
+
 @pytest.mark.gui()
 @pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
 @pytest.mark.skipif("GITHUB_ACTIONS" in os.environ, reason="Skip on Action Runner")
@@ -67,3 +156,265 @@ def test_synchronized_capture_triggers_timeout(monkeypatch, dbus_portal):
 
     with pytest.raises(TimeoutError):
         _ = dbus_portal._synchronized_capture(interactive=False)
+
+
+@pytest.mark.gui()
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_synchronized_capture_timeout_caches_interactive_required(
+    monkeypatch, dbus_portal
+):
+    # GIVEN the none-interactive portal mode is not known to fail
+    monkeypatch.setenv("XDG_CURRENT_DESKTOP", "GNOME")
+    assert not dbus_portal._load_interactive_required()
+
+    # WHEN a none-interactive screenshot request times out
+    timeout = 1
+    monkeypatch.setattr(dbus_portal, "TIMEOUT_SECONDS", timeout)
+    monkeypatch.setattr(
+        dbus_portal.OrgFreedesktopPortalScreenshot,
+        "grab_full_desktop",
+        lambda _: time.sleep(timeout + 0.1),
+    )
+    with pytest.raises(TimeoutError):
+        _ = dbus_portal._synchronized_capture(interactive=False)
+
+    # THEN the interactive mode is required for the same desktop only
+    assert dbus_portal._load_interactive_required()
+    monkeypatch.setenv("XDG_CURRENT_DESKTOP", "KDE")
+    assert not dbus_portal._load_interactive_required()
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_load_portal_mode_ignores_invalid_entry(monkeypatch, dbus_portal):
+    # GIVEN a cache file with an invalid entry for the current desktop
+    monkeypatch.setenv("XDG_CURRENT_DESKTOP", "GNOME")
+    cache_path = dbus_portal._get_portal_mode_cache_path()
+    cache_path.parent.mkdir(parents=True)
+    cache_path.write_text('{"gnome": true}', encoding="utf-8")
+
+    # WHEN the portal mode is loaded and updated
+    interactive_required = dbus_portal._load_interactive_required()
+    dbus_portal._update_portal_mode(has_captured=True)
+
+    # THEN the invalid entry is treated as empty and gets replaced
+    assert interactive_required is False
+    assert dbus_portal._has_captured_before()
+    assert '"gnome": {"has_captured": true}' in cache_path.read_text(encoding="utf-8")
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_portal_mode_cache_file_is_read_once(monkeypatch, dbus_portal):
+    # GIVEN the portal mode was persisted before
+    dbus_portal._update_portal_mode(interactive_required=True, has_captured=True)
+    dbus_portal._read_portal_modes.cache_clear()
+
+    read_calls = []
+    read_text = dbus_portal.Path.read_text
+
+    def _mocked_read_text(self, *args, **kwargs):
+        read_calls.append(self)
+        return read_text(self, *args, **kwargs)
+
+    monkeypatch.setattr(dbus_portal.Path, "read_text", _mocked_read_text)
+
+    # WHEN the portal mode is accessed repeatedly
+    assert dbus_portal._load_interactive_required()
+    assert dbus_portal._has_captured_before()
+    dbus_portal._update_portal_mode(interactive_required=True, has_captured=True)
+
+    # THEN the cache file is read only once
+    assert len(read_calls) == 1
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_capture_requests_none_interactive_mode(monkeypatch, dbus_portal):
+    # GIVEN the none-interactive mode is not known to fail
+    used_modes = []
+
+    def _mocked_synchronized_capture(interactive):
+        used_modes.append(interactive)
+        return dbus_portal.QtGui.QImage()
+
+    monkeypatch.setattr(
+        dbus_portal, "_synchronized_capture", _mocked_synchronized_capture
+    )
+    monkeypatch.setattr(dbus_portal, "is_portal_available", lambda: True)
+
+    # WHEN a screenshot is captured
+    _ = dbus_portal.capture()
+
+    # THEN the portal is requested in none-interactive mode
+    assert used_modes == [False]
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_capture_reports_missing_permission_if_interactive_required(
+    monkeypatch, dbus_portal
+):
+    # GIVEN the none-interactive mode failed on a previous run
+    dbus_portal._update_portal_mode(interactive_required=True)
+
+    def _mocked_synchronized_capture(interactive):
+        raise AssertionError("Should not be called!")
+
+    monkeypatch.setattr(
+        dbus_portal, "_synchronized_capture", _mocked_synchronized_capture
+    )
+    monkeypatch.setattr(dbus_portal, "is_portal_available", lambda: True)
+
+    # WHEN a screenshot is captured
+    # THEN the permission is reported as missing without requesting the portal
+    with pytest.raises(PermissionError, match="failed before"):
+        _ = dbus_portal.capture()
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_get_uri_from_response_with_dict_results(dbus_portal):
+    from PySide6 import QtDBus
+
+    # GIVEN a portal response message with results as dict
+    message = QtDBus.QDBusMessage.createSignal(
+        "/org/freedesktop/portal/desktop/request/1_0/normcap_token",
+        "org.freedesktop.portal.Request",
+        "Response",
+    )
+    message.setArguments([0, {"uri": "file:///tmp/screenshot.png", "other": 1}])
+
+    # WHEN the uri is extracted
+    uri = dbus_portal._get_uri_from_response(message)
+
+    # THEN it should be the uri of the screenshot
+    assert uri == "file:///tmp/screenshot.png"
+
+
+@pytest.mark.parametrize(
+    ("message_str", "expected_uri"),
+    [
+        (
+            'contents=(0, [Argument: a{sv} {"uri" = [Variant(QString): '
+            '"file:///tmp/screenshot.png"]}]) )',
+            "file:///tmp/screenshot.png",
+        ),
+        (
+            'contents=(0, [Argument: a{sv} {"uri" = [Variant(QString): '
+            '"file:///tmp/a%20b.png"], "zzz" = [Variant(int): 5]}]) )',
+            "file:///tmp/a%20b.png",
+        ),
+        ('contents=(0, [Argument: a{sv} {"other" = [Variant(int): 5]}]) )', None),
+    ],
+)
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_uri_regex_parses_message_string(dbus_portal, message_str, expected_uri):
+    result = dbus_portal._URI_RE.search(message_str)
+    assert (result.group(1) if result else None) == expected_uri
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_get_portal_is_reused_per_mode(dbus_portal):
+    portal = dbus_portal._get_portal(interactive=False, timeout_sec=1)
+    assert dbus_portal._get_portal(interactive=False, timeout_sec=1) is portal
+    assert dbus_portal._get_portal(interactive=True, timeout_sec=1) is not portal
+
+
+@pytest.mark.parametrize("interactive", [True, False])
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_portal_request_options(dbus_portal, interactive):
+    # GIVEN a portal in a certain mode
+    portal = dbus_portal._get_portal(interactive=interactive, timeout_sec=1)
+
+    # WHEN the options for a request are built
+    options = portal._get_options("normcap_token")
+
+    # THEN the mode of the portal is requested
+    assert options == {"interactive": interactive, "handle_token": "normcap_token"}
+
+
+@pytest.mark.gui()
+@pytest.mark.parametrize(
+    ("file_name", "uri_file_name"),
+    [("screenshot.png", "screenshot.png"), ("screen shot.png", "screen%20shot.png")],
+)
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_synchronized_capture_loads_and_removes_screenshot_file(
+    monkeypatch, tmp_path, dbus_portal, file_name, uri_file_name
+):
+    # GIVEN the portal responds with the uri of a screenshot file
+    image_path = tmp_path / file_name
+    image = dbus_portal.QtGui.QImage(
+        20, 10, dbus_portal.QtGui.QImage.Format.Format_RGB32
+    )
+    image.save(str(image_path))
+
+    monkeypatch.setattr(
+        dbus_portal.OrgFreedesktopPortalScreenshot,
+        "grab_full_desktop",
+        lambda cls: cls.on_result.emit(f"file://{tmp_path}/{uri_file_name}"),
+    )
+
+    # WHEN a screenshot is captured
+    result = dbus_portal._synchronized_capture(interactive=False)
+
+    # THEN the image should be loaded from the file
+    #    and the file should be removed afterwards
+    assert result.size().toTuple() == (20, 10)
+    assert not image_path.exists()
+
+
+@pytest.mark.gui()
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_synchronized_capture_raises_on_missing_screenshot_file(
+    monkeypatch, tmp_path, dbus_portal
+):
+    # GIVEN the portal responds with the uri of a file which doesn't exist
+    monkeypatch.setattr(
+        dbus_portal.OrgFreedesktopPortalScreenshot,
+        "grab_full_desktop",
+        lambda cls: cls.on_result.emit(f"file://{tmp_path}/missing.png"),
+    )
+
+    # WHEN a screenshot is captured
+    # THEN an error naming the file should be raised
+    with pytest.raises(RuntimeError, match="missing.png"):
+        _ = dbus_portal._synchronized_capture(interactive=False)
+
+
+@pytest.mark.parametrize(
+    ("has_captured", "portal_version", "expected_result"),
+    [(True, 2, True), (True, 1, False), (False, 2, False), (True, 0, False)],
+)
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_can_request_permission_directly(
+    monkeypatch, dbus_portal, has_captured, portal_version, expected_result
+):
+    dbus_portal._update_portal_mode(has_captured=has_captured)
+    monkeypatch.setattr(dbus_portal, "get_portal_version", lambda: portal_version)
+    assert dbus_portal.can_request_permission_directly() is expected_result
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_get_portal_version_without_portal(monkeypatch, dbus_portal):
+    from PySide6 import QtDBus
+
+    def _mocked_interface_call(*args):
+        return QtDBus.QDBusMessage()
+
+    monkeypatch.setattr(QtDBus.QDBusInterface, "call", _mocked_interface_call)
+    assert dbus_portal.get_portal_version() == 0
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_capture_fails_fast_without_portal(monkeypatch, dbus_portal):
+    # GIVEN the portal service is not available on the session bus
+    monkeypatch.setattr(dbus_portal, "is_portal_available", lambda: False)
+
+    def _mocked_synchronized_capture(interactive):
+        raise AssertionError("Should not be called!")
+
+    monkeypatch.setattr(
+        dbus_portal, "_synchronized_capture", _mocked_synchronized_capture
+    )
+
+    # WHEN a screenshot is captured
+    # THEN it fails right away without requesting a screenshot
+    with pytest.raises(RuntimeError, match="not available"):
+        _ = dbus_portal.capture()
@@ -3,6 +3,7 @@ import subprocess
 import sys
 
 import pytest
+from PySide6 import QtGui
 
 from normcap.screengrab import permissions
 
@@ -95,3 +96,123 @@ def test_macos_open_privacy_settings_on_non_macos(caplog):
     with caplog.at_level(logging.ERROR):
         permissions._macos_open_privacy_settings()
     assert "couldn't open" in caplog.text.lower()
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_dbus_portal_request_permission_skips_dialog(monkeypatch, qapp):
+    # GIVEN the portal can be asked for the permission directly
+    monkeypatch.setattr(
+        permissions.dbus_portal, "can_request_permission_directly", lambda: True
+    )
+    image = QtGui.QImage(20, 10, QtGui.QImage.Format.Format_RGB32)
+    monkeypatch.setattr(
+        permissions.dbus_portal, "_synchronized_capture", lambda interactive: image
+    )
+
+    def _mocked_dialog(*_, **__):
+        raise AssertionError("Dialog should not be shown!")
+
+    monkeypatch.setattr(permissions, "DbusPortalPermissionDialog", _mocked_dialog)
+
+    # WHEN the permission is requested
+    result = permissions.dbus_portal_show_request_permission_dialog(
+        title="title", text="text"
+    )
+
+    # THEN the permission should be requested without showing the dialog
+    assert result is True
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+@pytest.mark.parametrize("error", [PermissionError, TimeoutError, RuntimeError])
+def test_dbus_portal_request_permission_without_dialog_fails(
+    monkeypatch, caplog, qapp, error
+):
+    # GIVEN the portal can be asked for the permission directly
+    #    but the request fails (e.g. because the user denied it)
+    monkeypatch.setattr(
+        permissions.dbus_portal, "can_request_permission_directly", lambda: True
+    )
+
+    def _mocked_synchronized_capture(interactive):
+        raise error("Portal request failed")
+
+    monkeypatch.setattr(
+        permissions.dbus_portal, "_synchronized_capture", _mocked_synchronized_capture
+    )
+
+    # WHEN the permission is requested
+    with caplog.at_level(logging.WARNING):
+        result = permissions.dbus_portal_show_request_permission_dialog(
+            title="title", text="text"
+        )
+
+    # THEN the failure should be logged and the permission reported as missing
+    assert result is False
+    assert "permission failed" in caplog.text
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_dbus_portal_permission_dialog_is_reused(monkeypatch, qapp):
+    # GIVEN the permission can't be requested without the dialog
+    monkeypatch.setattr(
+        permissions.dbus_portal, "can_request_permission_directly", lambda: False
+    )
+    monkeypatch.setattr(permissions.DbusPortalPermissionDialog, "exec", lambda _: 1)
+    permissions._get_dbus_portal_permission_dialog.cache_clear()
+
+    # WHEN the permission is requested multiple times
+    for _ in range(2):
+        result = permissions.dbus_portal_show_request_permission_dialog(
+            title="title", text="text"
+        )
+        assert result is False
+
+    # THEN the dialog is created only once
+    assert permissions._get_dbus_portal_permission_dialog.cache_info().misses == 1
+    permissions._get_dbus_portal_permission_dialog.cache_clear()
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux specific test")
+def test_dbus_portal_permission_dialog_usable_after_denied_request(monkeypatch, qapp):
+    # GIVEN the permission can only be requested via the dialog
+    #    and the user denies the first request but grants the second
+    monkeypatch.setattr(
+        permissions.dbus_portal, "can_request_permission_directly", lambda: False
+    )
+    image = QtGui.QImage(20, 10, QtGui.QImage.Format.Format_RGB32)
+    responses = [PermissionError("Denied"), image]
+
+    def _mocked_synchronized_capture(interactive):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(
+        permissions.dbus_portal, "_synchronized_capture", _mocked_synchronized_capture
+    )
+
+    enabled_on_exec = []
+
+    def _mocked_exec(dialog):
+        enabled_on_exec.append(dialog.isEnabled())
+        dialog.accept_button_pressed()
+        return dialog.result()
+
+    monkeypatch.setattr(permissions.DbusPortalPermissionDialog, "exec", _mocked_exec)
+    permissions._get_dbus_portal_permission_dialog.cache_clear()
+
+    # WHEN the permission is requested twice
+    results = [
+        permissions.dbus_portal_show_request_permission_dialog(
+            title="title", text="text"
+        )
+        for _ in range(2)
+    ]
+
+    # THEN the reused dialog is enabled both times
+    #    and only the second request succeeds
+    assert enabled_on_exec == [True, True]
+    assert results == [False, True]
+    permissions._get_dbus_portal_permission_dialog.cache_clear()